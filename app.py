@@ -1,11 +1,22 @@
 import os
+import sys
 import sqlite3 # 雖然我們用 SQLAlchemy，但保留它可以捕捉特定的錯誤
-from flask import Flask, render_template, request, redirect, url_for, g
+import zlib
+import difflib
+import threading
+from itertools import chain
+from collections import OrderedDict
+from flask import Flask, Response, render_template, stream_template, request, redirect, url_for, g
 from datetime import datetime
 from zoneinfo import ZoneInfo # 【新增】引入時區資訊函式庫
 from flask_sqlalchemy import SQLAlchemy
 from flask_httpauth import HTTPBasicAuth
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError, StatementError
 from werkzeug.security import generate_password_hash, check_password_hash
+try:
+    import brotli # 選用套件：有安裝才會提供 br 壓縮，否則只用 gzip
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
@@ -16,6 +27,23 @@ if db_uri.startswith("postgres://"):
     db_uri = db_uri.replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///novel_site.db').replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 編輯記錄每頁顯示的筆數，以及差異比對結果快取在每個行程中最多佔用的記憶體 (位元組)
+app.config['EDIT_LOGS_PER_PAGE'] = int(os.environ.get('EDIT_LOGS_PER_PAGE', 20))
+app.config['EDIT_LOG_DIFF_CACHE_BYTES'] = int(os.environ.get('EDIT_LOG_DIFF_CACHE_BYTES', 32 * 1024 * 1024))
+# 留言批次寫入模式 (預設關閉)：留言先進本機緩衝檔，再定期整批寫入資料庫。
+# 批次是在同一個行程內組成的，需搭配能同時處理多個請求的 worker
+# (例如 gunicorn -k gthread --threads 8 或 -k gevent)；sync worker 會直接寫入資料庫。
+app.config['COMMENT_BUFFER_ENABLED'] = os.environ.get('COMMENT_BUFFER_ENABLED', '0') == '1'
+app.config['COMMENT_BUFFER_DIR'] = os.environ.get('COMMENT_BUFFER_DIR', 'comment_buffer')
+app.config['COMMENT_FLUSH_INTERVAL_MS'] = int(os.environ.get('COMMENT_FLUSH_INTERVAL_MS', 5))
+app.config['COMMENT_FLUSH_BATCH_SIZE'] = int(os.environ.get('COMMENT_FLUSH_BATCH_SIZE', 100))
+app.config['COMMENT_FLUSH_WAIT_SECONDS'] = float(os.environ.get('COMMENT_FLUSH_WAIT_SECONDS', 5))
+app.config['COMMENT_FLUSH_MAX_RETRIES'] = int(os.environ.get('COMMENT_FLUSH_MAX_RETRIES', 5))
+# 閱讀頁面的串流輸出與壓縮設定：小於 COMPRESS_MIN_SIZE 位元組的頁面不壓縮
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6)) # gzip: 1-9
+app.config['COMPRESS_BR_LEVEL'] = int(os.environ.get('COMPRESS_BR_LEVEL', 5)) # brotli: 0-11
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('STREAM_CHUNK_SIZE', 4096))
 db = SQLAlchemy(app)
 
 # --- 認證設定 ---
@@ -61,28 +89,36 @@ class Comment(db.Model):
     last_edited_timestamp = db.Column(db.String(20))
     edit_logs = db.relationship('CommentEditLog', backref='comment', cascade="all, delete-orphan", lazy=True)
     
+# 日誌中的大段文字 (old_summary / old_content) 設為 deferred，
+# 只有在真正開啟某一個版本時才會從資料庫載入；列表頁改讀寫入時就記下的字數欄位
 class BookEditLog(db.Model):
     __tablename__ = 'book_edit_logs'
+    __table_args__ = (db.Index('ix_book_edit_logs_book_ts_id', 'book_id', 'edit_timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
     old_title = db.Column(db.String(200), nullable=False)
     old_author = db.Column(db.String(100))
-    old_summary = db.Column(db.Text)
+    old_summary = db.deferred(db.Column(db.Text))
+    old_summary_size = db.Column(db.Integer)
     edit_timestamp = db.Column(db.String(20), nullable=False)
 
 class ChapterEditLog(db.Model):
     __tablename__ = 'chapter_edit_logs'
+    __table_args__ = (db.Index('ix_chapter_edit_logs_chapter_ts_id', 'chapter_id', 'edit_timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id'), nullable=False)
     old_title = db.Column(db.String(200), nullable=False)
-    old_content = db.Column(db.Text, nullable=False)
+    old_content = db.deferred(db.Column(db.Text, nullable=False))
+    old_content_size = db.Column(db.Integer)
     edit_timestamp = db.Column(db.String(20), nullable=False)
 
 class CommentEditLog(db.Model):
     __tablename__ = 'comment_edit_logs'
+    __table_args__ = (db.Index('ix_comment_edit_logs_comment_ts_id', 'comment_id', 'edit_timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False)
-    old_content = db.Column(db.Text, nullable=False)
+    old_content = db.deferred(db.Column(db.Text, nullable=False))
+    old_content_size = db.Column(db.Integer)
     edit_timestamp = db.Column(db.String(20), nullable=False)
     
 # --- 【請將這整段全新的函式複製到這裡】 ---
@@ -106,25 +142,227 @@ def init_db_command():
     """
     with app.app_context():
         db.create_all()
+        upgrade_edit_log_tables()
     print("Initialized the database and created all tables.")
 
+def upgrade_edit_log_tables():
+    """
+    create_all 不會修改已存在的表格，這裡替舊的資料庫補上編輯記錄後來新增的
+    字數欄位 (並用既有內容回填一次) 與分頁用的索引。重複執行也沒關係。
+    """
+    inspector = db.inspect(db.engine)
+    for model, size_column, content_column in ((BookEditLog, 'old_summary_size', 'old_summary'),
+                                               (ChapterEditLog, 'old_content_size', 'old_content'),
+                                               (CommentEditLog, 'old_content_size', 'old_content')):
+        table = model.__tablename__
+        if size_column not in {column['name'] for column in inspector.get_columns(table)}:
+            with db.engine.begin() as connection:
+                connection.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {size_column} INTEGER'))
+                connection.execute(db.text(f'UPDATE {table} SET {size_column} = length({content_column})'))
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
 # --- 輔助函式 ---
 def get_all_books():
     return Book.query.order_by(Book.title).all()
 
+def paginate_edit_logs(model, owner_column, owner_id, *columns):
+    """
+    以 (edit_timestamp, id) 做 keyset 分頁，由新到舊列出某個物件的編輯記錄。
+    只查詢中繼資料與內容長度，不會載入 old_content 本身。
+    回傳 (這一頁的記錄, 下一頁的游標或 None)。
+    """
+    per_page = app.config['EDIT_LOGS_PER_PAGE']
+    before_ts = request.args.get('before_ts')
+    before_id = request.args.get('before_id', type=int)
+
+    query = model.query.with_entities(model.id, model.edit_timestamp, *columns).filter(owner_column == owner_id)
+    if before_ts and before_id:
+        query = query.filter(db.or_(
+            model.edit_timestamp < before_ts,
+            db.and_(model.edit_timestamp == before_ts, model.id < before_id)
+        ))
+    logs = query.order_by(model.edit_timestamp.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(logs) > per_page:
+        logs = logs[:per_page]
+        next_cursor = {'before_ts': logs[-1].edit_timestamp, 'before_id': logs[-1].id}
+    return logs, next_cursor
+
+def get_next_revision(model, owner_column, owner_id, log):
+    """找出比 log 新的下一筆記錄；沒有的話代表下一個版本就是目前的內容。"""
+    return model.query.filter(
+        owner_column == owner_id,
+        db.or_(
+            model.edit_timestamp > log.edit_timestamp,
+            db.and_(model.edit_timestamp == log.edit_timestamp, model.id > log.id)
+        )
+    ).order_by(model.edit_timestamp.asc(), model.id.asc()).first()
+
+# 日誌寫入後就不會再被修改，所以同一組 (此版本, 下一版本) 的差異結果可以安全地快取
+# 快取以佔用的記憶體計算上限，而不是筆數：長篇章節的一份差異就可能有好幾 MB
+_diff_cache = OrderedDict() # key -> (差異的每一行, 佔用的位元組數)
+_diff_cache_bytes = 0
+_diff_cache_lock = threading.Lock()
+
+def get_revision_diff(key, load_texts):
+    """
+    取得兩個版本之間的差異 (unified diff 的每一行)。
+    load_texts 只會在快取沒有命中時才被呼叫，回傳 (此版本內容, 下一版本內容)。
+    """
+    global _diff_cache_bytes
+    with _diff_cache_lock:
+        if key in _diff_cache:
+            _diff_cache.move_to_end(key)
+            return _diff_cache[key][0]
+
+    old_text, new_text = load_texts()
+    diff_lines = list(difflib.unified_diff(
+        (old_text or '').splitlines(), (new_text or '').splitlines(),
+        fromfile='此版本', tofile='下一版本', lineterm=''
+    ))
+
+    size = sys.getsizeof(diff_lines) + sum(sys.getsizeof(line) for line in diff_lines)
+    limit = app.config['EDIT_LOG_DIFF_CACHE_BYTES']
+    if size > limit:
+        return diff_lines # 單一份差異就超過上限，不放進快取
+
+    with _diff_cache_lock:
+        if key not in _diff_cache:
+            _diff_cache[key] = (diff_lines, size)
+            _diff_cache_bytes += size
+        while _diff_cache_bytes > limit:
+            _, (_, evicted_size) = _diff_cache.popitem(last=False)
+            _diff_cache_bytes -= evicted_size
+    return diff_lines
+
+def format_book_revision(title, author, summary):
+    """把書本的三個欄位組成一段文字，方便和其他版本做差異比對。"""
+    return f"書名：{title}\n作者：{author or '(無)'}\n簡介：\n{summary or '(無)'}"
+
+# --- 串流輸出與壓縮 ---
+def coalesce_chunks(chunks, min_size):
+    """Jinja 串流會產生很多小片段，這裡把它們編碼並合併成至少 min_size 位元組的區塊再送出。"""
+    buffer, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= min_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def compress_chunks(chunks, encoding):
+    """逐塊壓縮，每一塊都 flush 出去，讓瀏覽器不必等整頁壓縮完才收到資料。"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=app.config['COMPRESS_BR_LEVEL'])
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31) # 31 = gzip 格式
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+def stream_page(template_name, **context):
+    """
+    以串流方式渲染樣板：頁首、導覽列和章節開頭一產生就送出，
+    並依照瀏覽器的 Accept-Encoding 即時以 br 或 gzip 壓縮。
+    """
+    chunks = coalesce_chunks(stream_template(template_name, **context), app.config['STREAM_CHUNK_SIZE'])
+
+    # 先讀到壓縮門檻為止；整頁都比門檻小的話就直接一次送出
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= app.config['COMPRESS_MIN_SIZE']:
+            break
+    else:
+        response = Response(b''.join(head), mimetype='text/html')
+        response.vary.add('Accept-Encoding')
+        return response
+
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    body = chain(head, chunks)
+    if encoding:
+        body = compress_chunks(body, encoding)
+    response = Response(body, mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+# --- 留言批次寫入 ---
+def is_bad_comment_error(exc):
+    """判斷寫入錯誤是不是留言本身的問題 (重試也不會成功)，而不是資料庫暫時無法使用。"""
+    return isinstance(exc, (IntegrityError, DataError)) or not isinstance(exc, DBAPIError)
+
+def drop_already_saved_comments(records):
+    """濾掉資料庫裡已經有的留言 (同章節、作者、時間與內容)，避免重新寫入時產生重複留言。"""
+    saved = Comment.query.with_entities(
+        Comment.chapter_id, Comment.author, Comment.timestamp, Comment.content
+    ).filter(
+        Comment.chapter_id.in_({record['chapter_id'] for record in records}),
+        Comment.timestamp.in_({record['timestamp'] for record in records})
+    ).all()
+    saved = {tuple(row) for row in saved}
+    return [record for record in records
+            if (record['chapter_id'], record['author'], record['timestamp'], record['content']) not in saved]
+
+def flush_buffered_comments(records, may_be_duplicate):
+    """把緩衝區中的一批留言用同一個交易寫入資料庫。"""
+    with app.app_context():
+        if may_be_duplicate:
+            records = drop_already_saved_comments(records)
+        db.session.add_all([Comment(**record) for record in records])
+        try:
+            db.session.commit()
+            return
+        except StatementError as e:
+            db.session.rollback()
+            if not is_bad_comment_error(e):
+                raise # 資料庫暫時無法使用，交給緩衝區重試
+
+        # 整批失敗時改為逐筆寫入，避免一筆壞資料 (例如章節已被刪除) 拖累整批留言
+        for record in records:
+            db.session.add(Comment(**record))
+            try:
+                db.session.commit()
+            except StatementError as e:
+                db.session.rollback()
+                if not is_bad_comment_error(e):
+                    raise
+                app.logger.warning('Dropping buffered comment for chapter %s: %s', record.get('chapter_id'), e)
+
+comment_buffer = None
+if app.config['COMMENT_BUFFER_ENABLED']:
+    from comment_buffer import CommentBuffer # 只在啟用時載入，它用到的 fcntl 在 Windows 上不存在
+    comment_buffer = CommentBuffer(
+        app.config['COMMENT_BUFFER_DIR'],
+        flush_buffered_comments,
+        interval=app.config['COMMENT_FLUSH_INTERVAL_MS'] / 1000,
+        batch_size=app.config['COMMENT_FLUSH_BATCH_SIZE'],
+        max_retries=app.config['COMMENT_FLUSH_MAX_RETRIES']
+    )
+
 # --- 主要路由 ---
 @app.route('/')
 @auth.login_required
 def index():
     books = Book.query.order_by(Book.created_timestamp.desc()).all()
-    return render_template('index.html', books=books, all_books=get_all_books())
+    return stream_page('index.html', books=books, all_books=get_all_books())
 
 @app.route('/book/<int:book_id>')
 @auth.login_required
 def view_book_toc(book_id):
     book = Book.query.get_or_404(book_id)
     chapters = Chapter.query.filter_by(book_id=book_id).order_by(Chapter.chapter_number.asc()).all()
-    return render_template('book_toc.html', book=book, chapters=chapters, all_books=get_all_books())
+    return stream_page('book_toc.html', book=book, chapters=chapters, all_books=get_all_books())
 
 @app.route('/chapter/<int:chapter_id>')
 @auth.login_required
@@ -146,15 +384,15 @@ def view_chapter(chapter_id):
         Chapter.chapter_number > chapter.chapter_number
     ).order_by(Chapter.chapter_number.asc()).first()
 
-    # 步驟 4: 渲染樣板。可以直接透過 'chapter' 物件取得關聯的書本和留言
-    return render_template('chapter.html', 
-                           chapter=chapter, 
-                           book=chapter.book, # 直接使用 backref
-                           comments=chapter.comments, # 直接使用 relationship
-                           all_books=get_all_books(), 
-                           editing_comment_id=editing_comment_id,
-                           prev_chapter_id=prev_chapter.id if prev_chapter else None,
-                           next_chapter_id=next_chapter.id if next_chapter else None)
+    # 步驟 4: 以串流方式渲染樣板。可以直接透過 'chapter' 物件取得關聯的書本和留言
+    return stream_page('chapter.html', 
+                       chapter=chapter, 
+                       book=chapter.book, # 直接使用 backref
+                       comments=chapter.comments, # 直接使用 relationship
+                       all_books=get_all_books(), 
+                       editing_comment_id=editing_comment_id,
+                       prev_chapter_id=prev_chapter.id if prev_chapter else None,
+                       next_chapter_id=next_chapter.id if next_chapter else None)
 # --- 後台書本 CRUD ---
 @app.route('/add_book', methods=['GET', 'POST'])
 @auth.login_required
@@ -201,6 +439,7 @@ def edit_book(book_id):
             old_title=book.title,
             old_author=book.author,
             old_summary=book.summary,
+            old_summary_size=len(book.summary or ''),
             edit_timestamp=get_current_taipei_time()
         )
         db.session.add(edit_log)
@@ -224,8 +463,39 @@ def edit_book(book_id):
 @auth.login_required
 def view_book_logs(book_id):
     book = Book.query.get_or_404(book_id)
-    logs = BookEditLog.query.filter_by(book_id=book_id).order_by(BookEditLog.edit_timestamp.desc()).all()
-    return render_template('book_logs.html', book=book, logs=logs, all_books=get_all_books())
+    logs, next_cursor = paginate_edit_logs(
+        BookEditLog, BookEditLog.book_id, book_id,
+        BookEditLog.old_title, BookEditLog.old_author,
+        BookEditLog.old_summary_size.label('content_size')
+    )
+    return render_template('book_logs.html', book=book, logs=logs, next_cursor=next_cursor, all_books=get_all_books())
+
+@app.route('/book/logs/<int:book_id>/<int:log_id>')
+@auth.login_required
+def view_book_log_revision(book_id, log_id):
+    book = Book.query.get_or_404(book_id)
+    log = BookEditLog.query.filter_by(id=log_id, book_id=book_id).first_or_404()
+    next_log = get_next_revision(BookEditLog, BookEditLog.book_id, book_id, log)
+
+    def load_texts():
+        old_text = format_book_revision(log.old_title, log.old_author, log.old_summary)
+        if next_log:
+            new_text = format_book_revision(next_log.old_title, next_log.old_author, next_log.old_summary)
+        else:
+            new_text = format_book_revision(book.title, book.author, book.summary)
+        return old_text, new_text
+
+    diff_lines = get_revision_diff(('book', log.id, log.edit_timestamp, next_log.id if next_log else None), load_texts)
+    return render_template('log_revision.html',
+                           heading=f'《{book.title}》的編輯記錄',
+                           log=log,
+                           fields=[('編輯前的標題', log.old_title), ('編輯前的作者', log.old_author or '(無)')],
+                           content_label='編輯前的簡介',
+                           content=log.old_summary or '(無)',
+                           diff_lines=diff_lines,
+                           next_log=next_log,
+                           back_url=url_for('view_book_logs', book_id=book_id),
+                           all_books=get_all_books())
     
 @app.route('/book/delete/<int:book_id>', methods=['POST'])
 @auth.login_required
@@ -274,7 +544,7 @@ def edit_chapter(chapter_id):
     chapter = Chapter.query.get_or_404(chapter_id)
     if request.method == 'POST':
         # 1. 記錄日誌
-        edit_log = ChapterEditLog(chapter_id=chapter_id, old_title=chapter.title, old_content=chapter.content, edit_timestamp=get_current_taipei_time())
+        edit_log = ChapterEditLog(chapter_id=chapter_id, old_title=chapter.title, old_content=chapter.content, old_content_size=len(chapter.content), edit_timestamp=get_current_taipei_time())
         db.session.add(edit_log)
         # 2. 更新章節
         chapter.chapter_number = int(request.form['chapter_number'])
@@ -293,6 +563,39 @@ def delete_chapter(chapter_id):
     db.session.commit()
     return redirect(url_for('view_book_toc', book_id=book_id))
 
+@app.route('/chapter/logs/<int:chapter_id>')
+@auth.login_required
+def view_chapter_logs(chapter_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    logs, next_cursor = paginate_edit_logs(
+        ChapterEditLog, ChapterEditLog.chapter_id, chapter_id,
+        ChapterEditLog.old_title,
+        ChapterEditLog.old_content_size.label('content_size')
+    )
+    return render_template('chapter_logs.html', chapter=chapter, book=chapter.book, logs=logs, next_cursor=next_cursor, all_books=get_all_books())
+
+@app.route('/chapter/logs/<int:chapter_id>/<int:log_id>')
+@auth.login_required
+def view_chapter_log_revision(chapter_id, log_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    log = ChapterEditLog.query.filter_by(id=log_id, chapter_id=chapter_id).first_or_404()
+    next_log = get_next_revision(ChapterEditLog, ChapterEditLog.chapter_id, chapter_id, log)
+
+    def load_texts():
+        return log.old_content, next_log.old_content if next_log else chapter.content
+
+    diff_lines = get_revision_diff(('chapter', log.id, log.edit_timestamp, next_log.id if next_log else None), load_texts)
+    return render_template('log_revision.html',
+                           heading=f'{chapter.title} 的編輯記錄',
+                           log=log,
+                           fields=[('編輯前的標題', log.old_title)],
+                           content_label='編輯前的內容',
+                           content=log.old_content,
+                           diff_lines=diff_lines,
+                           next_log=next_log,
+                           back_url=url_for('view_chapter_logs', chapter_id=chapter_id),
+                           all_books=get_all_books())
+
 # --- 【新】留言 CRUD ---
 @app.route('/comment/add/<int:chapter_id>', methods=['POST'])
 @auth.login_required
@@ -300,9 +603,26 @@ def add_comment(chapter_id):
     author = request.form['author']
     content = request.form['content']
     if author and content:
-        new_comment = Comment(chapter_id=chapter_id, author=author, content=content, timestamp = get_current_taipei_time())
-        db.session.add(new_comment)
-        db.session.commit()
+        # 先檢查暱稱長度與章節是否存在，壞資料就不會進到緩衝區或資料庫
+        if len(author) > Comment.author.type.length:
+            return "錯誤：暱稱太長了！", 400
+        Chapter.query.with_entities(Chapter.id).filter_by(id=chapter_id).first_or_404()
+
+        # 同一時間只處理一個請求的 worker (例如 gunicorn 預設的 sync worker) 湊不成批次，直接寫入即可
+        if comment_buffer and request.environ.get('wsgi.multithread'):
+            record = dict(chapter_id=chapter_id, author=author, content=content, timestamp=get_current_taipei_time())
+            # 等待前先把連線還給連線池；否則大量等待中的請求會佔滿連線池，背景執行緒反而拿不到連線寫入
+            db.session.remove()
+            # 等這筆留言所在的批次寫入資料庫後再跳轉，讓發文者一定看得到自己的留言
+            pending = comment_buffer.add(record)
+            if not pending.wait(app.config['COMMENT_FLUSH_WAIT_SECONDS']):
+                if pending.failed:
+                    return "錯誤：留言寫入失敗，請稍後再試。", 500
+                return "留言已收到，但還在寫入中，請稍後重新整理章節頁面。", 202
+        else:
+            new_comment = Comment(chapter_id=chapter_id, author=author, content=content, timestamp = get_current_taipei_time())
+            db.session.add(new_comment)
+            db.session.commit()
     return redirect(url_for('view_chapter', chapter_id=chapter_id) + '#comments-section')
 
 @app.route('/comment/update/<int:comment_id>', methods=['POST'])
@@ -312,7 +632,7 @@ def update_comment(comment_id):
     new_content = request.form['content']
     if new_content:
         # 1. 記錄日誌
-        edit_log = CommentEditLog(comment_id=comment_id, old_content=comment.content, edit_timestamp = get_current_taipei_time())
+        edit_log = CommentEditLog(comment_id=comment_id, old_content=comment.content, old_content_size=len(comment.content), edit_timestamp = get_current_taipei_time())
         db.session.add(edit_log)
         # 2. 更新留言
         comment.content = new_content
@@ -329,6 +649,38 @@ def delete_comment(comment_id):
     db.session.commit()
     return redirect(url_for('view_chapter', chapter_id=chapter_id) + '#comments-section')
 
+@app.route('/comment/logs/<int:comment_id>')
+@auth.login_required
+def view_comment_logs(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    logs, next_cursor = paginate_edit_logs(
+        CommentEditLog, CommentEditLog.comment_id, comment_id,
+        CommentEditLog.old_content_size.label('content_size')
+    )
+    return render_template('comment_logs.html', comment=comment, chapter=comment.chapter, logs=logs, next_cursor=next_cursor, all_books=get_all_books())
+
+@app.route('/comment/logs/<int:comment_id>/<int:log_id>')
+@auth.login_required
+def view_comment_log_revision(comment_id, log_id):
+    comment = Comment.query.get_or_404(comment_id)
+    log = CommentEditLog.query.filter_by(id=log_id, comment_id=comment_id).first_or_404()
+    next_log = get_next_revision(CommentEditLog, CommentEditLog.comment_id, comment_id, log)
+
+    def load_texts():
+        return log.old_content, next_log.old_content if next_log else comment.content
+
+    diff_lines = get_revision_diff(('comment', log.id, log.edit_timestamp, next_log.id if next_log else None), load_texts)
+    return render_template('log_revision.html',
+                           heading=f'{comment.author} 的留言編輯記錄',
+                           log=log,
+                           fields=[],
+                           content_label='編輯前的留言',
+                           content=log.old_content,
+                           diff_lines=diff_lines,
+                           next_log=next_log,
+                           back_url=url_for('view_comment_logs', comment_id=comment_id),
+                           all_books=get_all_books())
+
 """
 # ... 您所有的 CRUD 路由結束後 ...
 
@@ -392,6 +744,7 @@ def run_timestamp_correction():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade_edit_log_tables()
     app.run(debug=True)
 
 
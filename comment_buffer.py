@@ -0,0 +1,194 @@
+import os
+import json
+import glob
+import time
+import fcntl
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PendingComment:
+    """add() 回傳的憑證，用來等待這筆留言寫入資料庫的結果。"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.committed = False
+
+    def _finish(self, committed):
+        self.committed = committed
+        self._event.set()
+
+    @property
+    def failed(self):
+        return self._event.is_set() and not self.committed
+
+    def wait(self, timeout=None):
+        """等待最多 timeout 秒；只有在留言確實寫入資料庫時才回傳 True。"""
+        self._event.wait(timeout)
+        return self.committed
+
+
+class CommentBuffer:
+    """
+    留言的 write-behind 緩衝區。
+
+    留言先以一行 JSON 附加到本機的緩衝檔 (append-only)，再由背景執行緒
+    每隔 interval 秒、或累積到 batch_size 筆時，用一個交易整批寫入資料庫。
+    每個行程寫自己的區段檔並持有檔案鎖；行程當掉後留下的區段檔，
+    會在下一個行程收到第一筆留言時，由另一條背景執行緒重新寫入資料庫，
+    不會擋住新留言的寫入。
+
+    批次是以行程為單位組成的，只有在同一個行程能同時處理多個請求時
+    (例如 gunicorn 的 gthread / gevent worker) 才有合併寫入的效果。
+
+    寫入失敗會重試 max_retries 次；仍然失敗的話，整個區段檔會改名成
+    .dead 保留下來等人工處理，不會卡住後面的留言。
+    """
+
+    def __init__(self, directory, flush_func, interval=0.005, batch_size=100, retry_interval=1.0, max_retries=5):
+        self.directory = directory
+        # flush_func(records, may_be_duplicate)：把一串 record (dict) 寫入資料庫，失敗時應該丟出例外。
+        # may_be_duplicate 為 True 時，這批留言可能已經有部分寫入過 (重試或重新寫入孤兒區段檔)。
+        self.flush_func = flush_func
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._pid = None
+        self._seq = 0
+        self._file = None
+        self._path = None
+        self._pending = []
+
+    def add(self, record):
+        """把一筆留言寫入緩衝檔並排入待寫清單，回傳一個 PendingComment。"""
+        pending = PendingComment()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._cond:
+            self._ensure_started()
+            self._file.write(line)
+            self._file.flush()
+            self._pending.append((record, pending))
+            self._cond.notify()
+        return pending
+
+    def _ensure_started(self):
+        # gunicorn 可能在 fork 之前就載入 app，所以以 pid 判斷這個行程是否已經啟動過
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._open_segment()
+        except OSError:
+            self._pid = None # 下一筆留言進來時再試一次
+            raise
+        threading.Thread(target=self._run, name='comment-buffer-flusher', daemon=True).start()
+        threading.Thread(target=self._recover_orphans, name='comment-buffer-recovery', daemon=True).start()
+
+    def _open_segment(self):
+        self._seq += 1
+        path = os.path.join(self.directory, f'comments-{self._pid}-{int(time.time() * 1000)}-{self._seq}.jsonl')
+        segment_file = open(path, 'a', encoding='utf-8')
+        try:
+            fcntl.flock(segment_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            segment_file.close()
+            raise
+        self._file, self._path = segment_file, path
+
+    def _rotate_segment(self):
+        """換一個新的區段檔並回傳舊的 (file, path)；開不了新檔時回傳 None，繼續沿用舊檔。"""
+        old_segment = (self._file, self._path)
+        try:
+            self._open_segment()
+        except OSError:
+            logger.exception('Could not open a new comment buffer segment, keep appending to %s', self._path)
+            return None
+        return old_segment
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                # 第一筆進來後，最多再等 interval 秒讓這一批累積到 batch_size 筆
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size, timeout=self.interval)
+                batch, self._pending = self._pending, []
+                old_segment = self._rotate_segment()
+
+            # 任何錯誤都不能讓這條執行緒結束，否則之後的留言都只會等到逾時
+            committed = False
+            try:
+                committed = self._flush_with_retry([record for record, _ in batch], may_be_duplicate=False)
+                if old_segment:
+                    self._close_segment(*old_segment, committed)
+            except Exception:
+                logger.exception('Comment buffer flusher failed on a batch of %d comments', len(batch))
+            finally:
+                for _, pending in batch:
+                    pending._finish(committed)
+
+    def _flush_with_retry(self, records, may_be_duplicate):
+        """寫入成功回傳 True；重試 max_retries 次仍失敗則回傳 False。"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                # 前一次失敗時可能已經寫入了一部分，所以重試一律視為可能重複
+                self.flush_func(records, may_be_duplicate or attempt > 0)
+                return True
+            except Exception:
+                logger.exception('Failed to flush %d buffered comments (attempt %d/%d)',
+                                 len(records), attempt + 1, self.max_retries + 1)
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_interval)
+        return False
+
+    def _close_segment(self, segment_file, segment_path, committed):
+        # 先刪檔 (或改名) 再釋放鎖，避免其他行程在這之間把它當成孤兒重新寫入
+        if committed:
+            os.remove(segment_path)
+        else:
+            os.replace(segment_path, segment_path + '.dead')
+            logger.error('Moved unflushable comments to %s.dead', segment_path)
+        segment_file.close()
+
+    def _recover_orphans(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, 'comments-*.jsonl'))):
+            try:
+                self._recover_segment(path)
+            except Exception:
+                logger.exception('Failed to recover buffered comments from %s', path)
+
+    def _recover_segment(self, path):
+        if path == self._path:
+            return
+        try:
+            segment_file = open(path, 'r+', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        try:
+            fcntl.flock(segment_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # 還有活著的行程 (或這個行程的背景執行緒) 在使用這個區段檔
+            segment_file.close()
+            return
+        if not os.path.exists(path):
+            segment_file.close()
+            return
+
+        records = []
+        for line in segment_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # 行程當掉時可能只寫了半行，略過
+                logger.warning('Skipping a truncated record in %s', path)
+        committed = True
+        if records:
+            logger.info('Recovering %d buffered comments from %s', len(records), path)
+            # 原本的行程可能在寫入資料庫之後、刪除區段檔之前當掉
+            committed = self._flush_with_retry(records, may_be_duplicate=True)
+        self._close_segment(segment_file, path, committed)
\ No newline at end of file
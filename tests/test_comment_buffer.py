@@ -0,0 +1,121 @@
+import os
+import sys
+import base64
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+# app.py 在匯入時就讀取環境變數，所以要在匯入前先指向暫存的資料庫與緩衝區
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp_dir, 'test.db')
+os.environ['COMMENT_BUFFER_ENABLED'] = '1'
+os.environ['COMMENT_BUFFER_DIR'] = os.path.join(_tmp_dir, 'comment_buffer')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as novel_app
+from comment_buffer import CommentBuffer
+from werkzeug.security import generate_password_hash
+
+
+class CommentBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        # 測試用較快的雜湊，避免每個請求的密碼驗證拖慢並行測試
+        novel_app.users[novel_app.admin_user] = generate_password_hash(novel_app.admin_pass, method='pbkdf2:sha256:1')
+        credentials = f'{novel_app.admin_user}:{novel_app.admin_pass}'.encode()
+        self.headers = {'Authorization': 'Basic ' + base64.b64encode(credentials).decode()}
+        with novel_app.app.app_context():
+            novel_app.db.drop_all()
+            novel_app.db.create_all()
+            book = novel_app.Book(title='測試書', created_timestamp='2026-01-01 00:00:00')
+            novel_app.db.session.add(book)
+            novel_app.db.session.flush()
+            chapter = novel_app.Chapter(book_id=book.id, chapter_number=1, title='第一章', content='內容', timestamp='2026-01-01 00:00:00')
+            novel_app.db.session.add(chapter)
+            novel_app.db.session.commit()
+            self.chapter_id = chapter.id
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+    def post_comment(self, author, content):
+        client = novel_app.app.test_client()
+        # 模擬 gthread / gevent 這類會同時處理多個請求的 worker
+        return client.post(f'/comment/add/{self.chapter_id}', data={'author': author, 'content': content},
+                           headers=self.headers, environ_overrides={'wsgi.multithread': True})
+
+    def test_concurrent_posts_do_not_exhaust_the_connection_pool(self):
+        # 同時等待的留言數遠多於連線池大小 (預設 5 + 10)，等待中的請求不能佔住連線
+        statuses = []
+        def post(i):
+            statuses.append(self.post_comment(f'讀者{i}', f'留言{i}').status_code)
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(200)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [302] * 200)
+        with novel_app.app.app_context():
+            self.assertEqual(novel_app.Comment.query.filter_by(chapter_id=self.chapter_id).count(), 200)
+        self.assertEqual([name for name in os.listdir(os.environ['COMMENT_BUFFER_DIR']) if name.endswith('.dead')], [])
+
+    def test_poster_sees_own_comment_after_redirect(self):
+        response = self.post_comment('我', '第一個留言！')
+        self.assertEqual(response.status_code, 302)
+        page = novel_app.app.test_client().get(response.headers['Location'], headers=self.headers)
+        self.assertIn('第一個留言！', page.get_data(as_text=True))
+
+
+class CommentBufferThreadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.flushed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def flush(self, records, may_be_duplicate):
+        self.flushed.extend(records)
+
+    def test_flusher_survives_segment_errors(self):
+        buffer = CommentBuffer(self.directory, self.flush)
+        close_segment = buffer._close_segment
+        failures = []
+        def failing_close(*args):
+            if not failures:
+                failures.append(True)
+                raise OSError('disk went away')
+            close_segment(*args)
+        buffer._close_segment = failing_close
+
+        # 第一批寫入資料庫後刪檔失敗，留言仍然算寫入成功，背景執行緒也要繼續運作
+        self.assertTrue(buffer.add({'content': '一'}).wait(2))
+        self.assertTrue(buffer.add({'content': '二'}).wait(2))
+        self.assertEqual([record['content'] for record in self.flushed], ['一', '二'])
+
+    def test_orphan_recovery_does_not_block_new_comments(self):
+        with open(os.path.join(self.directory, 'comments-1-1-1.jsonl'), 'w', encoding='utf-8') as f:
+            f.write('{"content": "孤兒"}\n')
+        release = threading.Event()
+        def flush(records, may_be_duplicate):
+            if may_be_duplicate:
+                release.wait(5) # 模擬很慢的孤兒區段檔重新寫入
+            self.flush(records, may_be_duplicate)
+
+        buffer = CommentBuffer(self.directory, flush)
+        self.assertTrue(buffer.add({'content': '新留言'}).wait(2))
+        release.set()
+        for _ in range(50):
+            if len(self.flushed) == 2:
+                break
+            time.sleep(0.05)
+        self.assertEqual([record['content'] for record in self.flushed], ['新留言', '孤兒'])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file